@@ -18,6 +18,7 @@ from aligons.db import ensemblgenomes, phylo
 from aligons.util import cli, config, fs
 
 _log = logging.getLogger(__name__)
+_glob_cache: dict[tuple[str, str, str], tuple[Path, ...]] = {}
 
 
 def main(argv: list[str] | None = None):
@@ -38,6 +39,11 @@ def species_names(fmt: str = "fasta"):
     return [x.name for x in _species_dirs(fmt)]
 
 
+@functools.cache
+def _species_name_set(fmt: str = "fasta") -> frozenset[str]:
+    return frozenset(species_names(fmt))
+
+
 def fasize(species: str) -> Path:
     return get_file("fasize.chrom.sizes", species)
 
@@ -71,6 +77,7 @@ def list_chromosome_gff3(species: str) -> Iterable[Path]:
     return fs.sorted_naturally(_glob("*.chromosome*.gff3.gz", species))
 
 
+@functools.cache
 def get_file(pattern: str, species: str, subdir: str = ""):
     found = list(_glob(pattern, species, subdir))
     assert found, f"not found {pattern} in {species}/{subdir}"
@@ -93,7 +100,7 @@ def sanitize_queries(target: str, queries: list[str]):
         queries.remove(target)
     assert queries, target
     _log.debug(f"{queries=}")
-    assert set(queries) <= set(species_names()), f"{queries} vs {species_names()}"
+    assert _species_name_set().issuperset(queries), f"{queries} vs {species_names()}"
     return queries
 
 
@@ -102,21 +109,44 @@ def _species_dirs(fmt: str = "fasta") -> Iterable[Path]:
         if not (fmt_dir := prefix / fmt).exists():
             _log.warning(f"{fmt_dir} does not exist")
             continue
-        for path in fmt_dir.iterdir():
-            if path.is_dir():
-                yield path
+        yield from fs.iterdirs(fmt_dir)
+
 
+def _glob(pattern: str, species: str, subdir: str = "") -> tuple[Path, ...]:
+    key = (pattern, species, subdir)
+    if (found := _glob_cache.get(key)) is None:
+        found = _glob_uncached(*key)
+        if found:  # files not found yet may be created later
+            _glob_cache[key] = found
+    return found
 
-def _glob(pattern: str, species: str, subdir: str = ""):
-    is_enough = False  # to allow duplicated species from multiple origins
+
+def _glob_uncached(pattern: str, species: str, subdir: str) -> tuple[Path, ...]:
+    found: list[Path] = []
+    formats = _formats(pattern)
     for prefix in _iter_prefix():
-        for fmt in ("fasta", "gff3"):
+        for fmt in formats:
             d = prefix / fmt / species / subdir
-            for x in fs.sorted_naturally(d.glob(pattern)):
-                is_enough = True
-                yield x
-        if is_enough:
+            found.extend(fs.sorted_naturally(d.glob(pattern)))
+        if found:  # to allow duplicated species from multiple origins
             break
+    return tuple(found)
+
+
+def _formats(pattern: str) -> tuple[str, ...]:
+    if ".gff" in pattern:
+        return ("gff3",)
+    if pattern.endswith((".fa.gz", ".2bit", ".chrom.sizes")):
+        return ("fasta",)
+    return ("fasta", "gff3")
+
+
+def clear_cache():
+    """Forget directory scans, e.g., after creating files in the db."""
+    species_names.cache_clear()
+    _species_name_set.cache_clear()
+    _glob_cache.clear()
+    get_file.cache_clear()
 
 
 def _iter_prefix() -> Iterable[Path]:
@@ -131,7 +161,7 @@ def print_stats(clade: str, *, long: bool = False):
     newick = phylo.get_subtree([clade])
     root = phylo.parse_newick(newick)
     for pre, species in phylo.rectangulate(phylo.render_tips(root, [])):
-        if species not in species_names():
+        if species not in _species_name_set():
             print(f"{pre} {species}")
             continue
         chrom_sizes_ = chrom_sizes(species)
@@ -5,12 +5,23 @@
   - gff3/{species}/
   - maf/ensembl-compara/pairwise_alignments/
 """
+import concurrent.futures as confu
+import contextlib
+import ftplib
+import gzip
+import json
 import logging
 import os
+import queue
 import re
+import shutil
+import tempfile
+import threading
+import urllib.request
 from collections.abc import Iterable
 from ftplib import FTP
 from pathlib import Path
+from typing import IO
 
 from aligons import db
 from aligons.util import cli, config, fs, subp
@@ -18,6 +29,8 @@ from aligons.util import cli, config, fs, subp
 from . import phylo
 
 _log = logging.getLogger(__name__)
+_BLOCKSIZE = 1 << 20
+_MISC_FILES = re.compile(r"CHECKSUMS$|README$")
 
 
 def main(argv: list[str] | None = None):
@@ -35,9 +48,8 @@ def main(argv: list[str] | None = None):
                 print(sp)
         _log.info(f"{version()=}")
     elif (fmt_dir := _prefix_mirror() / args.fmt).exists():
-        for x in fmt_dir.iterdir():
-            if x.is_dir():
-                print(x)
+        for x in fs.iterdirs(fmt_dir):
+            print(x)
     else:
         _log.warning(f"No local mirror of release-{version()}")
 
@@ -63,31 +75,45 @@ def consolidate_compara_mafs(indir: Path):
         assert mobj, maf.name
         seq = mobj.group(1)
         infiles_by_seq.setdefault(seq, []).append(maf)
-    for seq, infiles in infiles_by_seq.items():
-        if seq == "supercontig":
-            continue
-        chrdir = outdir / f"chromosome.{seq}"
-        chrdir.mkdir(0o755, parents=True, exist_ok=True)
-        sing_maf = chrdir / "sing.maf"
-        _log.info(str(sing_maf))
-        if not fs.is_outdated(sing_maf, infiles):
-            continue
-        lines: list[str] = ["##maf version=1 scoring=LASTZ_NET\n"]
-        for maf in infiles:
-            lines.extend(readlines_compara_maf(maf))
-        with sing_maf.open("wb") as fout:
-            cmd = f"sed -e 's/{target}/{target_short}/' -e 's/{query}/{query_short}/'"
-            sed = subp.popen(cmd, stdin=subp.PIPE, stdout=subp.PIPE)
-            maff = subp.popen("mafFilter stdin", stdin=sed.stdout, stdout=fout)
-            # for padding, not for filtering
-            assert sed.stdout, cmd
-            sed.stdout.close()
-            sed.communicate("".join(lines).encode())
-            maff.communicate()
+    renames = {
+        target.encode(): target_short.encode(),
+        query.encode(): query_short.encode(),
+    }
+    # not cli.ThreadPool: this runs as a job on it and would wait on itself
+    jobs = cli.ThreadPool()._max_workers  # noqa: SLF001
+    with confu.ThreadPoolExecutor(jobs) as pool:
+        futures = [
+            pool.submit(_consolidate_chr, outdir / f"chromosome.{seq}", x, renames)
+            for seq, x in infiles_by_seq.items()
+            if seq != "supercontig"
+        ]
+        cli.wait_raise(futures)
     _log.info(f"{outdir}")
     return outdir
 
 
+def _consolidate_chr(chrdir: Path, infiles: list[Path], renames: dict[bytes, bytes]):
+    chrdir.mkdir(0o755, parents=True, exist_ok=True)
+    sing_maf = chrdir / "sing.maf"
+    _log.info(str(sing_maf))
+    if not fs.is_outdated(sing_maf, infiles):
+        return sing_maf
+    with sing_maf.open("wb") as fout:
+        # for padding, not for filtering
+        maff = subp.popen(
+            "mafFilter stdin", stdin=subp.PIPE, stdout=fout, bufsize=1 << 20
+        )
+        assert maff.stdin
+        maff.stdin.write(b"##maf version=1 scoring=LASTZ_NET\n")
+        for maf in infiles:
+            for line in readlines_compara_maf(maf):
+                for old, new in renames.items():
+                    line = line.replace(old, new, 1)  # noqa: PLW2901
+                maff.stdin.write(line)
+        maff.communicate()
+    return sing_maf
+
+
 def readlines_compara_maf(file: Path):
     """MAF files of ensembl compara have broken "a" lines.
 
@@ -96,44 +122,29 @@ def readlines_compara_maf(file: Path):
     s aaa.1
     s bbb.1
     """
-    with file.open("r") as fin:
+    with file.open("rb") as fin:
         for line in fin:
-            if line.startswith(("#", "a#")):
+            if line.startswith((b"#", b"a#")):
                 continue
-            if line.startswith(" score"):
-                yield "a" + line
+            if line.startswith(b" score"):
+                yield b"a" + line
             else:
                 yield line
 
 
-class FTPensemblgenomes(FTP):
+class FTPensemblgenomes:
+    """Client of the release directory; connections are opened on demand."""
+
     def __init__(self):
-        _log.info("FTP()")
-        super().__init__()
+        self._pool = _FTPPool(ftp_jobs())
+        self._nlst_lock = threading.Lock()
+        self._nlst_index = _read_nlst_index()
 
-    def quit(self):  # noqa: A003
-        _log.info(f"os.chdir({self.orig_wd})")
-        os.chdir(self.orig_wd)
-        _log.info("ftp.quit()")
-        resp = super().quit()
-        _log.info(resp)
-        return resp
-
-    def lazy_init(self):
-        if self.sock is not None:
-            return
-        self.orig_wd = Path.cwd()
-        host = "ftp.ensemblgenomes.org"
-        _log.debug(f"ftp.connect({host})")
-        _log.info(self.connect(host))
-        _log.debug("ftp.login()")
-        _log.info(self.login())
-        path = f"/pub/plants/release-{version()}"
-        _log.info(f"ftp.cwd({path})")
-        _log.info(self.cwd(path))
-        _log.info(f"os.chdir({_prefix_mirror()})")
-        _prefix_mirror().mkdir(0o755, parents=True, exist_ok=True)
-        os.chdir(_prefix_mirror())  # for RETR only
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args: object):
+        self._pool.quit()
 
     def remove_unavailable(self, species: list[str]) -> list[str]:
         available = self.available_species()
@@ -152,7 +163,7 @@ class FTPensemblgenomes(FTP):
         relpath = f"fasta/{species}/dna"
         outdir = _prefix_mirror() / relpath
         nlst = self.nlst_cache(relpath)
-        files = [self.retrieve(x) for x in self.remove_duplicates(nlst, "_sm.")]
+        files = self.retrieve_all(self.remove_duplicates(nlst, "_sm."))
         fs.checksums(outdir / "CHECKSUMS")
         return [f for f in files if f.suffix == ".gz"]
 
@@ -160,7 +171,7 @@ class FTPensemblgenomes(FTP):
         relpath = f"gff3/{species}"
         outdir = _prefix_mirror() / relpath
         nlst = self.nlst_cache(relpath)
-        files = [self.retrieve(x) for x in self.remove_duplicates(nlst)]
+        files = self.retrieve_all(self.remove_duplicates(nlst))
         fs.checksums(outdir / "CHECKSUMS")
         return [f for f in files if f.suffix == ".gz"]
 
@@ -169,9 +180,7 @@ class FTPensemblgenomes(FTP):
         outdir = _prefix_mirror() / relpath
         nlst = self.nlst_cache(relpath)
         sp = phylo.shorten(species)
-        for x in nlst:
-            if f"/{sp}_" in x:
-                self.retrieve(x)
+        self.retrieve_all([x for x in nlst if f"/{sp}_" in x])
         _log.debug(f"{outdir=}")
         dirs: list[Path] = []
         for targz in outdir.glob("*.tar.gz"):
@@ -183,49 +192,195 @@ class FTPensemblgenomes(FTP):
         return dirs
 
     def remove_duplicates(self, nlst: list[str], substr: str = ""):
-        matched = [x for x in nlst if "chromosome" in x]
-        if not matched:
-            matched = [x for x in nlst if "primary_assembly" in x]
-        if not matched:
-            matched = [x for x in nlst if "toplevel" in x]
-        if not matched:
-            matched = [x for x in nlst if f"{version()}.gff3" in x]
+        keys = ("chromosome", "primary_assembly", "toplevel", f"{version()}.gff3")
+        buckets: list[list[str]] = [[] for _ in keys]
+        misc: list[str] = []
+        for x in nlst:
+            if _MISC_FILES.search(x):
+                misc.append(x)
+                continue
+            for key, bucket in zip(keys, buckets, strict=True):
+                if key in x:
+                    bucket.append(x)
+                    break
+        empty: list[str] = []
+        matched = next((x for x in buckets if x), empty)
         matched = [x for x in matched if "musa_acuminata_v2" not in x]  # v52
         if substr:
             matched = [x for x in matched if substr in x]
         assert matched, substr
-        misc = [x for x in nlst if re.search("CHECKSUMS$|README$", x)]
         return matched + misc
 
+    def prefetch_nlst(self, species: list[str]):
+        """List all species directories at once and save the index once."""
+        relpaths = [f"fasta/{sp}/dna" for sp in species]
+        relpaths.extend([f"gff3/{sp}" for sp in species])
+        relpaths.append("maf/ensembl-compara/pairwise_alignments")
+        missing = [x for x in relpaths if x not in self._nlst_index]
+        if not missing:
+            return
+        with confu.ThreadPoolExecutor(max_workers=ftp_jobs()) as pool:
+            listed = list(pool.map(self._nlst, missing))
+        with self._nlst_lock:
+            self._nlst_index.update(zip(missing, listed, strict=True))
+            _write_nlst_index(self._nlst_index)
+
     def nlst_cache(self, relpath: str):
-        cache = _prefix_mirror() / relpath / ".ftp_nlst_cache"
-        if cache.exists():
-            _log.info(f"{cache=}")
-            with cache.open("r") as fin:
-                names = fin.read().rstrip().splitlines()
-            lst = [str(Path(relpath) / x) for x in names]
+        if (names := self._nlst_index.get(relpath)) is not None:
+            _log.info(f"nlst_cache({relpath})")
         else:
-            self.lazy_init()
+            names = self._nlst(relpath)
+            with self._nlst_lock:
+                self._nlst_index[relpath] = names
+                _write_nlst_index(self._nlst_index)
+        return [str(Path(relpath) / x) for x in names]
+
+    def _nlst(self, relpath: str):
+        with self._pool.connection() as ftp:
             _log.info(f"ftp.nlst({relpath})")
-            lst = self.nlst(relpath)  # ensembl does not support mlsd
-            cache.parent.mkdir(0o755, parents=True, exist_ok=True)
-            with cache.open("w") as fout:
-                fout.write("\n".join([Path(x).name for x in lst]) + "\n")
-        return lst
+            lst = ftp.nlst(relpath)  # ensembl does not support mlsd
+        return [Path(x).name for x in lst]
+
+    def retrieve_all(self, paths: Iterable[str]) -> list[Path]:
+        transport = config["ensemblgenomes"]["transport"]
+        if transport == "rsync":
+            return rsync_files(list(paths))
+        fetch = retrieve_https if transport == "https" else self.retrieve
+        with confu.ThreadPoolExecutor(max_workers=ftp_jobs()) as pool:
+            return list(pool.map(fetch, paths))
 
     def retrieve(self, path: str):
         outfile = _prefix_mirror() / path
         if not outfile.exists() and not cli.dry_run:
             outfile.parent.mkdir(0o755, parents=True, exist_ok=True)
-            with outfile.open("wb") as fout:
-                cmd = f"RETR {path}"
-                self.lazy_init()
-                _log.info(f"ftp.retrbinary({cmd})")
-                _log.info(self.retrbinary(cmd, fout.write))
+            partial = outfile.with_name(outfile.name + ".part")
+            with (
+                partial.open("wb", buffering=_BLOCKSIZE * 4) as fout,
+                self._pool.connection() as ftp,
+            ):
+                _retrbinary_into(ftp, f"RETR {path}", fout)
+                fout.flush()
+                if hasattr(os, "posix_fadvise"):  # not on macOS
+                    # DONTNEED skips dirty pages, so write them out first
+                    os.fdatasync(fout.fileno())
+                    os.posix_fadvise(fout.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            partial.replace(outfile)
         _log.info(f"{outfile}")
         return outfile
 
 
+class _FTPPool:
+    """Logged-in FTP connections kept alive and shared by threads.
+
+    At most max_connections are open; threads wait for an idle one beyond that.
+    """
+
+    def __init__(self, max_connections: int):
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle: queue.SimpleQueue[FTP] = queue.SimpleQueue()
+        self._opened: list[FTP] = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self._slots:
+            ftp = self._checkout()
+            try:
+                yield ftp
+            except BaseException:
+                # an aborted transfer leaves its reply unread on the control channel
+                self._opened.remove(ftp)
+                ftp.close()
+                raise
+            self._idle.put(ftp)
+
+    def _checkout(self):
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                ftp.voidcmd("NOOP")
+            except ftplib.all_errors:
+                _log.info("ftp: reconnecting stale connection")
+                self._opened.remove(ftp)
+                ftp.close()
+            else:
+                return ftp
+        ftp = FTP()
+        _login(ftp)
+        self._opened.append(ftp)
+        return ftp
+
+    def quit(self):  # noqa: A003
+        while self._opened:
+            ftp = self._opened.pop()
+            with contextlib.suppress(OSError, EOFError):
+                _log.info(ftp.quit())
+
+
+def _retrbinary_into(ftp: FTP, cmd: str, fout: IO[bytes]):
+    """Like ftp.retrbinary(), but recv_into a reused buffer without callbacks."""
+    _log.info(f"ftp.retrbinary({cmd})")
+    buf = bytearray(_BLOCKSIZE)
+    view = memoryview(buf)
+    ftp.voidcmd("TYPE I")
+    with ftp.transfercmd(cmd) as conn:
+        while size := conn.recv_into(buf):
+            fout.write(view[:size])
+    _log.info(ftp.voidresp())
+
+
+def _read_nlst_index() -> dict[str, list[str]]:
+    if not (file := _nlst_index_file()).exists():
+        return {}
+    _log.info(f"{file}")
+    with gzip.open(file, "rt") as fin:
+        return json.load(fin)
+
+
+def _write_nlst_index(index: dict[str, list[str]]):
+    file = _nlst_index_file()
+    file.parent.mkdir(0o755, parents=True, exist_ok=True)
+    with gzip.open(file, "wt") as fout:
+        json.dump(index, fout)
+
+
+def _nlst_index_file():
+    """Return the path of the cached NLST listings of the release."""
+    # listings of a release never change, so the cache never expires
+    return _prefix_mirror() / ".ftp_nlst_cache.json.gz"
+
+
+def _login(ftp: FTP):
+    host = "ftp.ensemblgenomes.org"
+    _log.debug(f"ftp.connect({host})")
+    _log.info(ftp.connect(host))
+    _log.debug("ftp.login()")
+    _log.info(ftp.login())
+    path = f"/pub/plants/release-{version()}"
+    _log.info(f"ftp.cwd({path})")
+    _log.info(ftp.cwd(path))
+
+
+def retrieve_https(path: str):
+    outfile = _prefix_mirror() / path
+    if not outfile.exists() and not cli.dry_run:
+        outfile.parent.mkdir(0o755, parents=True, exist_ok=True)
+        server = "ftp.ensemblgenomes.ebi.ac.uk"
+        url = f"https://{server}/pub/plants/release-{version()}/{path}"
+        _log.info(url)
+        partial = outfile.with_name(outfile.name + ".part")
+        with (
+            urllib.request.urlopen(url) as response,  # noqa: S310
+            partial.open("wb") as fout,
+        ):
+            shutil.copyfileobj(response, fout, _BLOCKSIZE)
+        partial.replace(outfile)
+    _log.info(f"{outfile}")
+    return outfile
+
+
 def rsync(relpath: str, options: str = ""):
     server = "ftp.ensemblgenomes.org"
     remote_prefix = f"rsync://{server}/all/pub/plants/release-{version()}"
@@ -234,6 +389,18 @@ def rsync(relpath: str, options: str = ""):
     return subp.run(f"rsync -auv {options} {src} {dst}")
 
 
+def rsync_files(paths: list[str]):
+    """Fetch files relative to the release root in a single rsync session."""
+    server = "ftp.ensemblgenomes.org"
+    src = f"rsync://{server}/all/pub/plants/release-{version()}/"
+    dst = _prefix_mirror()
+    with tempfile.NamedTemporaryFile("wt", suffix=".txt") as files_from:
+        files_from.write("".join(f"{x}\n" for x in paths))
+        files_from.flush()
+        subp.run(["rsync", "-auv", f"--files-from={files_from.name}", src, dst])
+    return [dst / x for x in paths]
+
+
 def prefix():
     return db.path(f"ensembl-{version()}")
 
@@ -250,5 +417,9 @@ def version():
     return int(os.getenv("ENSEMBLGENOMES_VERSION", config["ensemblgenomes"]["version"]))
 
 
+def ftp_jobs():
+    return int(os.getenv("ALIGONS_FTP_JOBS", config["ensemblgenomes"]["ftp_jobs"]))
+
+
 if __name__ == "__main__":
     main()
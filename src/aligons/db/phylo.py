@@ -144,22 +144,31 @@ def make_newick() -> str:
 
 
 def list_species(clade: str = "angiospermae") -> list[str]:
-    return extract_names(get_subtree([clade]))
+    return list(_list_species(clade))
+
+
+@functools.cache
+def _list_species(clade: str) -> tuple[str, ...]:
+    return tuple(extract_names(get_subtree([clade])))
 
 
 def expand_shortnames(shortnames: list[str]):
-    return _filter_by_shortname(list_species(), shortnames)
+    index = _shortname_index()
+    return (index[x] for x in shortnames if x in index)
 
 
-def _filter_by_shortname(species: Iterable[str], queries: Iterable[str]):
-    return (x for x in species if shorten(x) in queries)
+@functools.cache
+def _shortname_index(clade: str = "angiospermae") -> dict[str, str]:
+    return {shorten(x): x for x in _list_species(clade)}
 
 
+@functools.cache
 def shorten(name: str):
     """Oryza_sativa -> osat."""
-    if name.lower() == "olea_europaea_sylvestris":
+    lower = name.lower()
+    if lower == "olea_europaea_sylvestris":
         return "oesy"
-    split = name.lower().split("_")
+    split = lower.split("_")
     return split[0][0] + split[1][:3]
 
 
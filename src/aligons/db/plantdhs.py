@@ -10,6 +10,8 @@ from . import tools
 
 _log = logging.getLogger(__name__)
 _HOST = "plantdhs.org"
+_QUERY = re.compile(r"Rice|TIGR7")
+_LINK = re.compile(r"/download/plantdhs/([^\"']+)")
 
 
 def main(argv: list[str] | None = None):
@@ -30,9 +32,9 @@ def retrieve_deploy(query: str):
     outfile = db_prefix() / query
     if outfile.name.endswith(".zip"):
         outfile = outfile.with_suffix(".gz")
-    content = tools.retrieve_content(url, rawfile)
+    tools.retrieve_file(url, rawfile)
     if outfile.suffix == ".gz":
-        future = cli.thread_submit(tools.compress, content, outfile)
+        future = cli.thread_submit(tools.compress_file, rawfile, outfile)
     else:
         future = cli.thread_submit(fs.symlink, rawfile, outfile)
     return cli.thread_submit(htslib.try_index, future)
@@ -40,13 +42,13 @@ def retrieve_deploy(query: str):
 
 def iter_download_queries():
     for query in iter_download_queries_all():
-        if re.search(r"Rice|TIGR7", query):
+        if _QUERY.search(query):
             yield query
 
 
 def iter_download_queries_all():
     content = download_page()
-    for mobj in re.finditer(r"/download/plantdhs/([^\"']+)", content):
+    for mobj in _LINK.finditer(content):
         yield mobj[1]
 
 
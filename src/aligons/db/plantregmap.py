@@ -10,6 +10,8 @@ from . import tools
 
 _log = logging.getLogger(__name__)
 _HOST = "plantregmap.gao-lab.org"
+_QUERY = re.compile(r"Oryza_sativa_Japonica|Solanum_lycopersicum")
+_LINK = re.compile(r"download_ftp\.php\?([^\"']+)")
 
 
 def main(argv: list[str] | None = None):
@@ -33,9 +35,9 @@ def retrieve_deploy(query: str):
         outfile = outfile.with_suffix(outfile.suffix + ".gz")
     elif outfile.name.endswith(".gtf.gz"):
         outfile = outfile.with_suffix("").with_suffix(".gff.gz")
-    content = tools.retrieve_content(url, rawfile)
+    tools.retrieve_file(url, rawfile)
     if outfile.suffix == ".gz":
-        future = cli.thread_submit(tools.compress, content, outfile)
+        future = cli.thread_submit(tools.compress_file, rawfile, outfile)
     else:
         future = cli.thread_submit(fs.symlink, rawfile, outfile)
     return cli.thread_submit(htslib.try_index, future)
@@ -43,13 +45,13 @@ def retrieve_deploy(query: str):
 
 def iter_download_queries():
     for query in iter_download_queries_all():
-        if re.search(r"Oryza_sativa_Japonica|Solanum_lycopersicum", query):
+        if _QUERY.search(query):
             yield query
 
 
 def iter_download_queries_all():
     content = download_php()
-    for mobj in re.finditer(r"download_ftp\.php\?([^\"']+)", content):
+    for mobj in _LINK.finditer(content):
         yield mobj[1]
 
 
@@ -64,8 +66,9 @@ def db_prefix():
 
 
 def rglob(pattern: str, species: str = "."):
-    for species_dir in db_prefix().iterdir():
-        if re.search(species, species_dir.name, re.IGNORECASE):
+    pattern_sp = re.compile(species, re.IGNORECASE)
+    for species_dir in fs.iterdirs(db_prefix()):
+        if pattern_sp.search(species_dir.name):
             for x in species_dir.rglob(pattern):
                 yield x
 
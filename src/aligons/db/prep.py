@@ -34,6 +34,7 @@ def prepare_ensemblgenomes(species: list[str]):
     assert species
     with ensemblgenomes.FTPensemblgenomes() as ftp:
         species = ftp.remove_unavailable(species)
+        ftp.prefetch_nlst(species)
         pool = cli.ThreadPool()
         futures: list[cli.FuturePath] = []
         for sp in species:
@@ -48,12 +49,6 @@ def prepare_ensemblgenomes(species: list[str]):
         futures.clear()
         futures = [pool.submit(tools.softmask, sp) for sp in species]
         cli.wait_raise(futures)
-    if False:  # ensemble does not support rsync
-        for sp in species:
-            options = "--include *_sm.chromosome.*.fa.gz --exclude *.gz"
-            ensemblgenomes.rsync(f"fasta/{sp}/dna", options)
-            options = "--include *.chromosome.*.gff3.gz --exclude *.gz"
-            ensemblgenomes.rsync(f"gff3/{sp}", options)
 
 
 def _ln_or_bgzip(src: Path, species: str, fmt: str = ""):
@@ -64,9 +59,8 @@ def _ln_or_bgzip(src: Path, species: str, fmt: str = ""):
     dst = ensemblgenomes.prefix() / fmt / species / dstname
     if ".chromosome." in dstname:
         fs.symlink(src, dst)
-    elif fs.is_outdated(dst, src):
-        with src.open("rb") as fin, dst.open("wb") as fout:
-            fout.write(htslib.bgzip_compress(fs.gzip_decompress(fin.read())))
+    elif fs.is_outdated(dst, src) and not cli.dry_run:
+        htslib.zcat_bgzip([src], dst)
     return dst
 
 
@@ -1,18 +1,36 @@
+import contextlib
 import gzip
 import io
 import logging
 import re
+import shutil
+import tempfile
 import urllib.request
+from collections.abc import Iterator
 from pathlib import Path
+from typing import IO
 from urllib.parse import urlparse
+from zipfile import ZipFile
 
 import polars as pl
 
 from aligons import db
+from aligons.db import api
 from aligons.extern import htslib, jellyfish, kent
-from aligons.util import cli, fs
+from aligons.util import cli, fs, subp
 
 _log = logging.getLogger(__name__)
+_GFF_COLUMNS = [
+    "seqid",
+    "source",
+    "type",
+    "start",
+    "end",
+    "score",
+    "strand",
+    "phase",
+    "attributes",
+]
 
 
 def main(argv: list[str] | None = None):
@@ -28,10 +46,12 @@ def index_fasta(paths: list[Path]):
         paths = [f.result() for f in _split_toplevel_fa(paths[0])]
     fts = [cli.thread_submit(kent.faToTwoBit, x) for x in paths]
     genome = _create_genome_bgzip(paths)
-    htslib.faidx(genome)
-    kent.faToTwoBit(genome)
-    kent.faSize(genome)
+    fts.extend(
+        cli.thread_submit(fn, genome)
+        for fn in (htslib.faidx, kent.faToTwoBit, kent.faSize)
+    )
     cli.wait_raise(fts)
+    api.clear_cache()
     return genome
 
 
@@ -42,6 +62,7 @@ def index_gff3(paths: list[Path]):  # gff3/{species}
         paths = split_gff(paths[0])
     genome = _create_genome_bgzip(paths)
     htslib.tabix(genome)
+    api.clear_cache()
     return genome
 
 
@@ -98,26 +119,105 @@ def compress(content: bytes, outfile: Path) -> Path:
     return outfile
 
 
+def compress_file(infile: Path, outfile: Path) -> Path:
+    """Streaming compress() from a file; GFF is sorted out of core by polars."""
+    bgzipped = htslib.to_be_bgzipped(outfile.name)
+    if not cli.dry_run and fs.is_outdated(outfile):
+        outfile.parent.mkdir(0o755, parents=True, exist_ok=True)
+        if bgzipped and ".gff" in outfile.name:
+            _sort_gff_bgzip(infile, outfile)
+        else:
+            _compress_stream(infile, outfile, bgzipped=bgzipped)
+    _log.info(f"{outfile}")
+    return outfile
+
+
+def _compress_stream(infile: Path, outfile: Path, *, bgzipped: bool):
+    with _open_decompressed(infile) as fin, outfile.open("wb") as fout:
+        if bgzipped or outfile.suffix == ".gz":
+            cmd = ["bgzip", "-@4"] if bgzipped else fs.pigz_args("-c")
+            p = subp.popen(cmd, stdin=subp.PIPE, stdout=fout, quiet=True)
+            assert p.stdin
+            shutil.copyfileobj(fin, p.stdin, 1 << 20)
+            p.communicate()
+        else:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+
+
+def _sort_gff_bgzip(infile: Path, outfile: Path):
+    with tempfile.TemporaryDirectory(dir=outfile.parent) as tmpdir:
+        plain = Path(tmpdir) / "plain.gff"
+        body = Path(tmpdir) / "body.gff"
+        decompress_gff(infile, plain)
+        lines: list[bytes] = []
+        with plain.open("rb") as fin:
+            for line in fin:
+                lines.append(line)
+                if not line.startswith(b"#"):
+                    break
+        sort_gff_body_file(plain, body)
+        with body.open("rb") as fin, outfile.open("wb") as fout:
+            bgzip = subp.popen(["bgzip", "-@4"], stdin=subp.PIPE, stdout=fout)
+            assert bgzip.stdin
+            bgzip.stdin.write(extract_gff_header(b"".join(lines)))
+            shutil.copyfileobj(fin, bgzip.stdin, 1 << 20)
+            bgzip.communicate()
+
+
+def decompress_gff(infile: Path, outfile: Path):
+    """Decompress GFF without the blank lines that read_gff_body also drops."""
+    with _open_decompressed(infile) as fin, outfile.open("wb") as fout:
+        fout.writelines(line for line in fin if not line.isspace())
+
+
+@contextlib.contextmanager
+def _open_decompressed(path: Path) -> Iterator[IO[bytes]]:
+    with path.open("rb") as fin:
+        magic = fin.read(4)
+    if fs.is_zip(magic):
+        with ZipFile(path, "r") as zin:
+            members = zin.namelist()
+            assert len(members) == 1, members
+            with zin.open(members[0]) as fin:
+                yield fin
+    elif fs.is_gz(magic):
+        unpigz = subp.popen(fs.pigz_args("-dc", path), stdout=subp.PIPE, quiet=True)
+        assert unpigz.stdout
+        with unpigz.stdout as fin:
+            yield fin
+        if unpigz.wait():
+            raise subp.CalledProcessError(unpigz.returncode, unpigz.args)
+    else:
+        with path.open("rb") as fin:
+            yield fin
+
+
 def retrieve_content(
     url: str, outfile: Path | None = None, *, force: bool = False
 ) -> bytes:
+    if cli.dry_run and not force:
+        return b""
+    return retrieve_file(url, outfile, force=force).read_bytes()
+
+
+def retrieve_file(
+    url: str, outfile: Path | None = None, *, force: bool = False
+) -> Path:
     _log.debug(url)
     if outfile is None:
         urlp = urlparse(url)
         outfile = db.path_mirror(urlp.netloc + urlp.path)
-    if cli.dry_run and not force:
-        content = b""
-    elif fs.is_outdated(outfile):
+    if (force or not cli.dry_run) and fs.is_outdated(outfile):
         outfile.parent.mkdir(0o755, parents=True, exist_ok=True)
-        response = urllib.request.urlopen(url)  # noqa: S310
-        content = response.read()
-        with outfile.open("wb") as fout:
-            fout.write(content)
-    else:
-        with outfile.open("rb") as fin:
-            content = fin.read()
+        partial = outfile.with_name(outfile.name + ".part")
+        with (
+            urllib.request.urlopen(url) as response,  # noqa: S310
+            partial.open("wb") as fout,
+        ):
+            shutil.copyfileobj(response, fout, 1 << 20)
+        partial.replace(outfile)
     _log.info(f"{outfile}")
-    return content
+    return outfile
 
 
 def split_gff(path: Path):
@@ -136,10 +236,15 @@ def split_gff(path: Path):
         _log.info(f"{outfile}")
         if cli.dry_run or not fs.is_outdated(outfile, path):
             continue
-        with gzip.open(outfile, "wt") as fout:
-            fout.write("##gff-version 3\n")
-            fout.write(regions.get(seqid, ""))
-            fout.write(data.sort(["start"]).write_csv(has_header=False, separator="\t"))
+        with outfile.open("wb") as fout:
+            bgzip = subp.popen("bgzip -@2", stdin=subp.PIPE, stdout=fout, quiet=True)
+            assert bgzip.stdin
+            bgzip.stdin.write(b"##gff-version 3\n")
+            bgzip.stdin.write(regions.get(seqid, "").encode())
+            data.sort(["start"]).write_csv(
+                bgzip.stdin, has_header=False, separator="\t"
+            )
+            bgzip.communicate()
     return files
 
 
@@ -193,6 +298,15 @@ def sort_gff_body(content: bytes) -> bytes:
     return bio.getvalue()
 
 
+def sort_gff_body_file(infile: Path, outfile: Path):
+    """Sort uncompressed GFF with the streaming engine to bound memory."""
+    (
+        scan_gff_body(infile)
+        .sort(["seqid", "start"])
+        .sink_csv(outfile, has_header=False, separator="\t")
+    )
+
+
 def read_gff_body(source: Path | str | bytes):
     if isinstance(source, bytes):
         source = re.sub(rb"\n\n+", rb"\n", source)
@@ -202,17 +316,19 @@ def read_gff_body(source: Path | str | bytes):
         comment_char="#",
         has_header=False,
         dtypes=[pl.Utf8],
-        new_columns=[
-            "seqid",
-            "source",
-            "type",
-            "start",
-            "end",
-            "score",
-            "strand",
-            "phase",
-            "attributes",
-        ],
+        new_columns=_GFF_COLUMNS,
+    )
+
+
+def scan_gff_body(path: Path):
+    return pl.scan_csv(
+        path,
+        separator="\t",
+        comment_char="#",
+        has_header=False,
+        dtypes=[pl.Utf8],
+        new_columns=_GFF_COLUMNS,
+        low_memory=True,
     )
 
 
@@ -1,7 +1,10 @@
 import concurrent.futures as confu
 import gzip
+import io
 import logging
+import os
 import re
+import shutil
 from collections.abc import Iterable
 from pathlib import Path
 
@@ -59,29 +62,48 @@ def faidx_query(bgz: Path, region: str, outfile: Path):
 
 def concat_bgzip(infiles: list[Path], outfile: Path):
     if fs.is_outdated(outfile, infiles) and not cli.dry_run:
-        with outfile.open("wb") as fout:
-            bgzip = subp.popen("bgzip -@2", stdin=subp.PIPE, stdout=fout)
-            assert bgzip.stdin
-            if ".gff" in outfile.name:
+        if ".gff" in outfile.name:
+            with outfile.open("wb") as fout:
+                bgzip = subp.popen(
+                    "bgzip -@2", stdin=subp.PIPE, stdout=fout, bufsize=1 << 20
+                )
+                assert bgzip.stdin
                 header = collect_gff3_header(infiles)
                 bgzip.stdin.write(header)
-                bgzip.stdin.flush()
                 _log.debug(header.decode())
-            for file in infiles:
-                if ".gff" in outfile.name:
-                    p = sort_clean_chromosome_gff3(file)
-                    (stdout, _stderr) = p.communicate()
-                    bgzip.stdin.write(stdout)
-                    bgzip.stdin.flush()
-                else:
-                    with gzip.open(file, "rb") as fin:
-                        bgzip.stdin.write(fin.read())
-                        bgzip.stdin.flush()
-            bgzip.communicate()
+                for file in infiles:
+                    bgzip.stdin.writelines(sort_clean_chromosome_gff3(file))
+                bgzip.communicate()
+        else:
+            zcat_bgzip(infiles, outfile)
     _log.info(f"{outfile}")
     return outfile
 
 
+def zcat_bgzip(infiles: list[Path], outfile: Path):
+    """Recompress gzip files into a bgzip file without reading them in Python.
+
+    BGZF files are concatenated as they are; that is still valid BGZF.
+    """
+    if all(is_bgzf(x) for x in infiles):
+        with outfile.open("wb") as fout:
+            for infile in infiles:
+                with infile.open("rb") as fin:
+                    shutil.copyfileobj(fin, fout, 1 << 20)
+        return outfile
+    with outfile.open("wb") as fout:
+        zcat = subp.popen(fs.pigz_args("-dc", *infiles), stdout=subp.PIPE)
+        assert zcat.stdout
+        args = ["bgzip", f"-@{os.cpu_count() or 1}"]
+        bgzip = subp.popen(args, stdin=zcat.stdout, stdout=fout)
+        zcat.stdout.close()
+        failed = [p for p in (zcat, bgzip) if p.wait()]
+    if failed:
+        outfile.unlink(missing_ok=True)
+        raise subp.CalledProcessError(failed[-1].returncode, failed[-1].args)
+    return outfile
+
+
 def collect_gff3_header(infiles: Iterable[Path]):
     header = b"##gff-version 3\n"
     for file in infiles:
@@ -102,6 +124,12 @@ def bgzip(path: Path):
     return outfile
 
 
+def is_bgzf(path: Path):
+    with path.open("rb") as fin:
+        head = fin.read(14)
+    return head.startswith(b"\x1f\x8b\x08\x04") and head[12:14] == b"BC"
+
+
 def bgzip_compress(data: bytes) -> bytes:
     return subp.run(["bgzip", "-@2"], input=data, stdout=subp.PIPE).stdout
 
@@ -153,18 +181,23 @@ def to_be_tabixed(filename: str):
     return filename.removesuffix(".gz").removesuffix(".zip").endswith(ext)
 
 
-def sort_clean_chromosome_gff3(infile: Path):
+def sort_clean_chromosome_gff3(infile: Path) -> list[bytes]:
     # TODO: jbrowse2 still needs billzt/gff3sort precision?
-    p1 = subp.popen(f"zgrep -v '^#' {infile!s}", stdout=subp.PIPE, quiet=True)
-    p2 = subp.popen(
-        "grep -v '\tchromosome\t'", stdin=p1.stdout, stdout=subp.PIPE, quiet=True
-    )
-    if p1.stdout:
-        p1.stdout.close()
-    p3 = subp.popen("sort -k4,4n", stdin=p2.stdout, stdout=subp.PIPE, quiet=True)
-    if p2.stdout:
-        p2.stdout.close()
-    return p3
+    lines = list(_iter_gff3_body(infile))
+    lines.sort(key=_gff3_start)
+    return lines
+
+
+def _iter_gff3_body(infile: Path):
+    with gzip.open(infile, "rb") as fin:
+        for line in io.BufferedReader(fin, buffer_size=1 << 20):
+            if line.isspace() or line.startswith(b"#") or b"\tchromosome\t" in line:
+                continue
+            yield line
+
+
+def _gff3_start(line: bytes):
+    return int(line.split(b"\t", 4)[3])
 
 
 if __name__ == "__main__":
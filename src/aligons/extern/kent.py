@@ -5,9 +5,8 @@ dst: ./multiple/{target}/{clade}/phastcons.bw
 
 https://github.com/ucscGenomeBrowser/kent
 """
-import gzip
 import logging
-import shutil
+import tempfile
 from pathlib import Path
 
 from aligons.db import api, phylo
@@ -37,15 +36,17 @@ def integrate_wigs(clade: Path):
     _log.debug(f"{[str(x) for x in wigs]}")
     outfile = clade / "phastcons.bw"
     is_to_run = not cli.dry_run and fs.is_outdated(outfile, wigs)
+    if not is_to_run:
+        return outfile
+    zcat_args = fs.pigz_args("-dc", *wigs)
+    zcat = subp.popen(zcat_args, stdout=subp.PIPE, quiet=True)
+    assert zcat.stdout
     args = ["wigToBigWig", "stdin", chrom_sizes, outfile]
-    p = subp.popen(args, if_=is_to_run, stdin=subp.PIPE)
-    if is_to_run:
-        assert p.stdin
-        for wig in wigs:
-            with gzip.open(wig, "rb") as fin:
-                p.stdin.write(fin.read())
-                p.stdin.flush()
-    p.communicate()
+    p = subp.popen(args, stdin=zcat.stdout)
+    zcat.stdout.close()
+    if failed := [x for x in (zcat, p) if x.wait()]:
+        outfile.unlink(missing_ok=True)
+        raise subp.CalledProcessError(failed[-1].returncode, failed[-1].args)
     return outfile
 
 
@@ -73,36 +74,55 @@ def faSize(genome_fa_gz: Path):  # noqa: N802
 
 def axt_chain(t2bit: Path, q2bit: Path, axtgz: Path, options: ConfDict):
     chain = axtgz.with_suffix("").with_suffix(".chain")
-    cmd = "axtChain"
-    cmd += subp.optjoin(options, "-")
-    cmd += f" stdin {t2bit} {q2bit} {chain}"
+    cmd = axt_chain_cmd(t2bit, q2bit, chain, options)
     is_to_run = fs.is_outdated(chain, axtgz)
-    p = subp.popen(cmd, if_=is_to_run, stdin=subp.PIPE)
-    if is_to_run and not cli.dry_run:
-        assert p.stdin
-        with gzip.open(axtgz, "rb") as fin:
-            shutil.copyfileobj(fin, p.stdin)
-            p.stdin.close()
-    p.communicate()
+    if not is_to_run:
+        return chain
+    zcat_args = fs.pigz_args("-dc", axtgz)
+    zcat = subp.popen(zcat_args, stdout=subp.PIPE, quiet=True)
+    assert zcat.stdout
+    p = subp.popen(cmd, stdin=zcat.stdout)
+    zcat.stdout.close()
+    if failed := [x for x in (zcat, p) if x.wait()]:
+        chain.unlink(missing_ok=True)
+        raise subp.CalledProcessError(failed[-1].returncode, failed[-1].args)
     return chain
 
 
+def axt_chain_cmd(t2bit: Path, q2bit: Path, chain: Path, options: ConfDict):
+    cmd = "axtChain"
+    cmd += subp.optjoin(options, "-")
+    return cmd + f" stdin {t2bit} {q2bit} {chain}"
+
+
 def merge_sort_pre(chains: list[Path], target_sizes: Path, query_sizes: Path):
     parent = {x.parent for x in chains}
     subdir = parent.pop()
     assert not parent, "chains are in the same directory"
     pre_chain = subdir / "pre.chain.gz"
     is_to_run = fs.is_outdated(pre_chain, chains)
-    merge_cmd = ["chainMergeSort"] + [str(x) for x in chains]
-    merge = subp.popen(merge_cmd, if_=is_to_run, stdout=subp.PIPE)
-    assert merge.stdout
-    pre_cmd = f"chainPreNet stdin {target_sizes} {query_sizes} stdout"
-    pre = subp.popen(pre_cmd, if_=is_to_run, stdin=merge.stdout, stdout=subp.PIPE)
-    merge.stdout.close()
-    if is_to_run and not cli.dry_run:
-        (stdout, _stderr) = pre.communicate()
-        with gzip.open(pre_chain, "wb") as fout:
-            fout.write(stdout)
+    if not is_to_run:
+        return pre_chain
+    with tempfile.NamedTemporaryFile("wt", suffix=".txt") as input_list:
+        input_list.writelines(f"{x}\n" for x in chains)
+        input_list.flush()
+        merge_cmd = f"chainMergeSort -inputList={input_list.name}"
+        merge = subp.popen(merge_cmd, stdout=subp.PIPE)
+        assert merge.stdout
+        pre_cmd = f"chainPreNet stdin {target_sizes} {query_sizes} stdout"
+        pre = subp.popen(pre_cmd, stdin=merge.stdout, stdout=subp.PIPE)
+        merge.stdout.close()
+        assert pre.stdout
+        procs = [merge, pre]
+        if not cli.dry_run:
+            with pre_chain.open("wb") as fout:
+                gz = subp.popen(fs.pigz_args("-c"), stdin=pre.stdout, stdout=fout)
+                procs.append(gz)
+        pre.stdout.close()
+        failed = [p for p in procs if p.wait()]
+    if failed:
+        pre_chain.unlink(missing_ok=True)
+        raise subp.CalledProcessError(failed[-1].returncode, failed[-1].args)
     return pre_chain
 
 
@@ -114,18 +134,18 @@ def chain_net_syntenic(
 ):
     syntenic_net = pre_chain.parent / "syntenic.net"
     is_to_run = fs.is_outdated(syntenic_net, pre_chain)
+    if not is_to_run:
+        return syntenic_net
     cn_cmd = "chainNet"
     cn_cmd += subp.optjoin(options, "-")
-    cn_cmd += f" stdin {target_sizes} {query_sizes} stdout /dev/null"
+    cn_cmd += f" {pre_chain} {target_sizes} {query_sizes} stdout /dev/null"
     ns_cmd = f"netSyntenic stdin {syntenic_net}"
-    cn = subp.popen(cn_cmd, if_=is_to_run, stdin=subp.PIPE, stdout=subp.PIPE)
-    ns = subp.popen(ns_cmd, if_=is_to_run, stdin=subp.PIPE)
-    content = b""
-    if is_to_run and not cli.dry_run:
-        with gzip.open(pre_chain, "rb") as fout:
-            content = fout.read()
-    (cn_out, _) = cn.communicate(content)
-    ns.communicate(cn_out)
+    cn = subp.popen(cn_cmd, stdout=subp.PIPE)
+    assert cn.stdout
+    ns = subp.popen(ns_cmd, stdin=cn.stdout)
+    cn.stdout.close()
+    ns.communicate()
+    cn.wait()
     return syntenic_net
 
 
@@ -137,24 +157,19 @@ def net_axt_maf(
     options: ConfDict = empty_options,
 ):
     sing_maf = syntenic_net.parent / "sing.maf"
+    is_to_run = fs.is_outdated(sing_maf, [syntenic_net, pre_chain])
+    if not is_to_run:
+        return sing_maf
     target_2bit = api.genome_2bit(target)
     query_2bit = api.genome_2bit(query)
     target_sizes = api.fasize(target)
     query_sizes = api.fasize(query)
-    is_to_run = fs.is_outdated(sing_maf, [syntenic_net, pre_chain])
     toaxt_cmd = "netToAxt"
     toaxt_cmd += subp.optjoin(options, "-")
-    toaxt_cmd += f" {syntenic_net} stdin {target_2bit} {query_2bit} stdout"
-    toaxt = subp.popen(toaxt_cmd, if_=is_to_run, stdin=subp.PIPE, stdout=subp.PIPE)
-    assert toaxt.stdin
+    toaxt_cmd += f" {syntenic_net} {pre_chain} {target_2bit} {query_2bit} stdout"
+    toaxt = subp.popen(toaxt_cmd, stdout=subp.PIPE)
     assert toaxt.stdout
-    if is_to_run and not cli.dry_run:
-        with gzip.open(pre_chain, "rb") as fout:
-            shutil.copyfileobj(fout, toaxt.stdin)
-            toaxt.stdin.close()
-    sort = subp.popen(
-        "axtSort stdin stdout", if_=is_to_run, stdin=toaxt.stdout, stdout=subp.PIPE
-    )
+    sort = subp.popen("axtSort stdin stdout", stdin=toaxt.stdout, stdout=subp.PIPE)
     toaxt.stdout.close()
     assert sort.stdout
     tprefix = phylo.shorten(target)
@@ -163,7 +178,7 @@ def net_axt_maf(
         f"axtToMaf -tPrefix={tprefix}. -qPrefix={qprefix}. stdin"
         f" {target_sizes} {query_sizes} {sing_maf}"
     )
-    atm = subp.popen(axttomaf_cmd, if_=is_to_run, stdin=sort.stdout)
+    atm = subp.popen(axttomaf_cmd, stdin=sort.stdout)
     sort.stdout.close()
     atm.communicate()
     return sing_maf
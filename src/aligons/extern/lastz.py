@@ -6,13 +6,11 @@ dst: ./pairwise/{target}/{query}/{chromosome}/sing.maf
 https://lastz.github.io/lastz/
 """
 import concurrent.futures as confu
-import gzip
 import logging
 from pathlib import Path
-from types import MappingProxyType
 
 from aligons.db import api
-from aligons.util import ConfDict, cli, config, fs, read_config, subp
+from aligons.util import ConfDict, cli, config, empty_options, fs, read_config, subp
 
 from . import kent
 
@@ -22,26 +20,48 @@ _log = logging.getLogger(__name__)
 def main(argv: list[str] | None = None):
     parser = cli.ArgumentParser()
     parser.add_argument("-c", "--config", type=Path)
+    parser.add_argument("--jobs-per-align", type=int, default=1)
+    parser.add_argument("--keep-axt", action="store_true")
     parser.add_argument("target", choices=api.species_names())
     parser.add_argument("query", nargs="*")
     args = parser.parse_args(argv or None)
     if args.config:
         read_config(args.config)
-    run(args.target, args.query)
-
+    run(
+        args.target,
+        args.query,
+        jobs_per_align=args.jobs_per_align,
+        keep_axt=args.keep_axt,
+    )
+
+
+def run(
+    target: str,
+    queries: list[str],
+    *,
+    jobs_per_align: int = 1,
+    keep_axt: bool = False,
+):
+    """Align chromosome pairs with jobs // jobs_per_align workers.
 
-def run(target: str, queries: list[str]):
+    Each worker runs lastz and axtChain (and pigz if keep_axt) at the same time;
+    reserve cores for them by increasing jobs_per_align.
+    """
     queries = api.sanitize_queries(target, queries)
+    jobs: int = cli.ThreadPool()._max_workers  # noqa: SLF001
     futures: list[confu.Future[Path]] = []
-    for query in queries:
-        pa = PairwiseAlignment(target, query, config)
-        futures.extend(pa.run())
+    with confu.ThreadPoolExecutor(max(1, jobs // jobs_per_align)) as pool:
+        for query in queries:
+            pa = PairwiseAlignment(target, query, config, keep_axt=keep_axt)
+            futures.extend(pa.run(pool))
     cli.wait_raise(futures)
     return Path("pairwise") / target
 
 
 class PairwiseAlignment:
-    def __init__(self, target: str, query: str, options: ConfDict):
+    def __init__(
+        self, target: str, query: str, options: ConfDict, *, keep_axt: bool = False
+    ):
         self._target = target
         self._query = query
         self._target_sizes = api.fasize(target)
@@ -51,9 +71,9 @@ class PairwiseAlignment:
         self._axtch_opts: ConfDict = options["axtChain"]
         self._cn_opts: ConfDict = options["chainNet"]
         self._toaxt_opts: ConfDict = options["netToAxt"]
+        self._keep_axt = keep_axt
 
-    def run(self):
-        pool = cli.ThreadPool()
+    def run(self, pool: confu.Executor):
         if not cli.dry_run:
             self._outdir.mkdir(0o755, parents=True, exist_ok=True)
         target_chromosomes = api.list_chromosome_2bit(self._target)
@@ -62,15 +82,16 @@ class PairwiseAlignment:
             [pool.submit(self.align_chr, t, q) for q in query_chromosomes]
             for t in target_chromosomes
         ]
-        return [pool.submit(self.wait_integrate, futures) for futures in flists]
+        return [cli.submit_after(futures, self.integrate) for futures in flists]
 
     def align_chr(self, t2bit: Path, q2bit: Path):
+        if not self._keep_axt:
+            return lastz_chain(
+                t2bit, q2bit, self._outdir, self._lastz_opts, self._axtch_opts
+            )
         axtgz = lastz(t2bit, q2bit, self._outdir, self._lastz_opts)
         return kent.axt_chain(t2bit, q2bit, axtgz, self._axtch_opts)
 
-    def wait_integrate(self, futures: list[confu.Future[Path]]):
-        return self.integrate([f.result() for f in futures])
-
     def integrate(self, chains: list[Path]):
         pre_chain = kent.merge_sort_pre(chains, self._target_sizes, self._query_sizes)
         syntenic_net = kent.chain_net_syntenic(
@@ -84,23 +105,56 @@ class PairwiseAlignment:
         return sing_maf
 
 
-def lastz(
-    t2bit: Path, q2bit: Path, outdir: Path, options: ConfDict = MappingProxyType({})
+def lastz_chain(
+    t2bit: Path,
+    q2bit: Path,
+    outdir: Path,
+    lastz_opts: ConfDict = empty_options,
+    axtch_opts: ConfDict = empty_options,
 ):
+    """Pipe lastz into axtChain without writing .axt.gz."""
+    chain = _prepare_outfile(t2bit, q2bit, outdir, ".chain")
+    cmd = _lastz_cmd(t2bit, q2bit, lastz_opts)
+    is_to_run = fs.is_outdated(chain, [t2bit, q2bit])
+    lastz = subp.popen(cmd, if_=is_to_run, stdout=subp.PIPE)
+    assert lastz.stdout
+    axtch_cmd = kent.axt_chain_cmd(t2bit, q2bit, chain, axtch_opts)
+    axtch = subp.popen(axtch_cmd, if_=is_to_run, stdin=lastz.stdout)
+    lastz.stdout.close()
+    axtch.communicate()
+    if returncode := lastz.wait():
+        raise subp.CalledProcessError(returncode, cmd)
+    return chain
+
+
+def lastz(t2bit: Path, q2bit: Path, outdir: Path, options: ConfDict = empty_options):
+    axtgz = _prepare_outfile(t2bit, q2bit, outdir, ".axt.gz")
+    cmd = _lastz_cmd(t2bit, q2bit, options)
+    is_to_run = fs.is_outdated(axtgz, [t2bit, q2bit])
+    lastz = subp.popen(cmd, if_=is_to_run, stdout=subp.PIPE)
+    assert lastz.stdout
+    if is_to_run and not cli.dry_run:
+        with axtgz.open("wb") as fout:
+            gz_args = fs.pigz_args("-1")
+            subp.run(gz_args, stdin=lastz.stdout, stdout=fout, quiet=True)
+    lastz.stdout.close()
+    if returncode := lastz.wait():
+        raise subp.CalledProcessError(returncode, cmd)
+    return axtgz
+
+
+def _lastz_cmd(t2bit: Path, q2bit: Path, options: ConfDict):
+    cmd = f"lastz {t2bit} {q2bit} --format=axt"
+    return cmd + subp.optjoin(options)
+
+
+def _prepare_outfile(t2bit: Path, q2bit: Path, outdir: Path, ext: str):
     target_label = t2bit.stem.rsplit("dna_sm.", 1)[1]
     query_label = q2bit.stem.rsplit("dna_sm.", 1)[1]
     subdir = outdir / target_label
     if not cli.dry_run:
         subdir.mkdir(0o755, exist_ok=True)
-    axtgz = subdir / f"{query_label}.axt.gz"
-    cmd = f"lastz {t2bit} {q2bit} --format=axt"
-    cmd += subp.optjoin(options)
-    is_to_run = fs.is_outdated(axtgz, [t2bit, q2bit])
-    lastz = subp.run(cmd, stdout=subp.PIPE, if_=is_to_run)
-    if is_to_run and not cli.dry_run:
-        with gzip.open(axtgz, "wb") as fout:
-            fout.write(lastz.stdout)
-    return axtgz
+    return subdir / f"{query_label}{ext}"
 
 
 if __name__ == "__main__":
@@ -4,14 +4,24 @@ src: ./pairwise/{target}/{query}/{chromosome}/sing.maf
 dst: ./pairwise/{target}/{query}/cram/genome.cram
 """
 import concurrent.futures as confu
+import functools
 import logging
 import re
 from pathlib import Path
+from typing import IO
 
 from aligons.db import api
 from aligons.util import cli, fs, subp
 
 _log = logging.getLogger(__name__)
+_SAM_ROW = re.compile(
+    rb"^(?P<qname>\S+)\t(?P<flag>\d+)\t"
+    rb"\w+\.(?P<rname>\S+)\t(?P<pos>\d+)\t(?P<mapq>\d+)\t"
+    rb"(?P<head_cigar>\d+H)?(?P<cigar>\S+?)(?P<tail_cigar>\d+H)?\t"
+    rb"(?P<rnext>\S+)\t(?P<pnext>\w+)\t(?P<tlen>\d+)\t"
+    rb"(?P<seq>\w+)\t(?P<misc>.+$)",
+    re.MULTILINE,
+)
 
 
 def main(argv: list[str] | None = None):
@@ -40,80 +50,105 @@ def mafs2cram(path: Path):
     outdir = path / "cram"
     if not cli.dry_run:
         outdir.mkdir(0o755, exist_ok=True)
-    pool = cli.ThreadPool()
+    pool = _cram_pool()
+    chr_dirs = fs.sorted_naturally(path.glob("chromosome.*"))
+    concurrent = min(len(chr_dirs), cli.ProcessPool.max_workers)
+    threads = cli.samtools_threads(concurrent)
     futures: list[confu.Future[Path]] = []
-    for chr_dir in fs.sorted_naturally(path.glob("chromosome.*")):
+    for chr_dir in chr_dirs:
         maf = chr_dir / "sing.maf"
         if not maf.exists():
             _log.warning(f"not found {maf}")
             continue
         cram = outdir / (chr_dir.name + ".cram")
-        futures.append(pool.submit(maf2cram, maf, cram, reference))
-    return pool.submit(merge_crams, futures, outdir)
+        futures.append(pool.submit(maf2cram, maf, cram, reference, threads=threads))
+    return cli.thread_submit(merge_crams, futures, outdir)
+
+
+@functools.cache
+def _cram_pool():
+    """Return the process pool for the SAM rewrite, 4+ CPUs per samtools sort."""
+    jobs = cli.ThreadPool()._max_workers  # noqa: SLF001
+    return cli.ProcessPool(max(1, jobs // 4))
 
 
 def merge_crams(futures: list[confu.Future[Path]], outdir: Path):
     crams: list[Path] = [f.result() for f in futures]
     outfile = outdir / "genome.cram"
     is_to_run = bool(crams) and fs.is_outdated(outfile, crams)
-    cmd = f"samtools merge --no-PG -O CRAM -@ 2 -f -o {outfile!s} "
+    threads = cli.samtools_threads()
+    cmd = f"samtools merge --no-PG -O CRAM -@ {threads} -f -o {outfile!s} "
     cmd += " ".join([str(x) for x in crams])
     subp.run(cmd, if_=is_to_run)
-    subp.run(["samtools", "index", outfile], if_=is_to_run)
+    subp.run(["samtools", "index", "-@", str(threads), outfile], if_=is_to_run)
     if outfile.exists():
         print(outfile)
     return outfile
 
 
-def maf2cram(infile: Path, outfile: Path, reference: Path):
+def maf2cram(infile: Path, outfile: Path, reference: Path, *, threads: int = 2):
     is_to_run = fs.is_outdated(outfile, infile)
     mafconv = subp.popen(
         ["maf-convert", "sam", infile], if_=is_to_run, stdout=subp.PIPE
     )
-    (stdout, _stderr) = mafconv.communicate()
-    content = sanitize_cram(reference, stdout, if_=is_to_run)
-    cmd = f"samtools sort --no-PG -O CRAM -@ 2 -o {outfile!s}"
-    subp.popen(cmd, if_=is_to_run, stdin=subp.PIPE).communicate(content)
+    cmd = f"samtools sort --no-PG -O CRAM -@ {threads} --reference {reference!s}"
+    cmd += f" -o {outfile!s}"
+    sort = subp.popen(cmd, if_=is_to_run, stdin=subp.PIPE, bufsize=1 << 20)
+    assert mafconv.stdout
+    assert sort.stdin
+    with sort.stdin:
+        sort.stdin.writelines(sanitize_sam(mafconv.stdout))
+    sort.communicate()
+    mafconv.wait()
     _log.info(f"{outfile}")
     return outfile
 
 
-def sanitize_cram(reference: Path, sam: bytes, *, if_: bool):
-    def repl(mobj: re.Match[bytes]):
-        qstart = 0
-        if int(mobj["flag"]) & 16:  # reverse strand
-            if tail := mobj["tail_cigar"]:
-                qstart = int(tail.rstrip(b"H")) + 1
-        elif head := mobj["head_cigar"]:
-            qstart = int(head.rstrip(b"H")) + 1
-        qend = qstart + len(mobj["seq"]) - 1
-        cells = [
-            mobj["qname"] + f":{qstart}-{qend}".encode(),
-            mobj["flag"],
-            mobj["rname"],
-            mobj["pos"],
-            mobj["mapq"],
-            mobj["cigar"],
-            mobj["rnext"],
-            mobj["pnext"],
-            mobj["tlen"],
-            mobj["seq"],
-            mobj["misc"],
-        ]
-        return b"\t".join(cells)
-
-    patt = re.compile(
-        rb"^(?P<qname>\S+)\t(?P<flag>\d+)\t"
-        rb"\w+\.(?P<rname>\S+)\t(?P<pos>\d+)\t(?P<mapq>\d+)\t"
-        rb"(?P<head_cigar>\d+H)?(?P<cigar>\S+?)(?P<tail_cigar>\d+H)?\t"
-        rb"(?P<rnext>\S+)\t(?P<pnext>\w+)\t(?P<tlen>\d+)\t"
-        rb"(?P<seq>\w+)\t(?P<misc>.+$)"
-    )
-    lines = [patt.sub(repl, line) for line in sam.splitlines(keepends=True)]
-    cmd = f"samtools view --no-PG -h -C -@ 2 -T {reference!s}"
-    samview = subp.popen(cmd, if_=if_, stdin=subp.PIPE, stdout=subp.PIPE)
-    (stdout, _stderr) = samview.communicate(b"".join(lines))
-    return stdout
+def sanitize_sam(stream: IO[bytes]):
+    """Rewrite SAM rows in chunks cut at line boundaries."""
+    rest = b""
+    while chunk := stream.read(1 << 20):
+        chunk = rest + chunk
+        cut = chunk.rfind(b"\n") + 1
+        rest = chunk[cut:]
+        yield _sanitize_sam(chunk[:cut])
+    yield _sanitize_sam(rest)
+
+
+def _sanitize_sam(sam: bytes) -> bytearray:
+    view = memoryview(sam)
+    out = bytearray()
+    last = 0
+    for mobj in _SAM_ROW.finditer(sam):
+        out += view[last : mobj.start()]
+        out += _sanitize_row(mobj)
+        last = mobj.end()
+    out += view[last:]
+    return out
+
+
+def _sanitize_row(mobj: re.Match[bytes]):
+    qstart = 0
+    if int(mobj["flag"]) & 16:  # reverse strand
+        if tail := mobj["tail_cigar"]:
+            qstart = int(tail.rstrip(b"H")) + 1
+    elif head := mobj["head_cigar"]:
+        qstart = int(head.rstrip(b"H")) + 1
+    qend = qstart + len(mobj["seq"]) - 1
+    cells = [
+        mobj["qname"] + f":{qstart}-{qend}".encode(),
+        mobj["flag"],
+        mobj["rname"],
+        mobj["pos"],
+        mobj["mapq"],
+        mobj["cigar"],
+        mobj["rnext"],
+        mobj["pnext"],
+        mobj["tlen"],
+        mobj["seq"],
+        mobj["misc"],
+    ]
+    return b"\t".join(cells)
 
 
 if __name__ == "__main__":
@@ -54,8 +54,9 @@ def phastCons(  # noqa: N802
     wig = path / "phastcons.wig.gz"
     is_to_run = fs.is_outdated(wig, [cons_mod, noncons_mod])
     p = subp.run(cmd, if_=is_to_run, stdout=subp.PIPE)
-    with gzip.open(devnull_if(not is_to_run, wig), "wb") as fout:
-        fout.write(p.stdout)
+    if is_to_run:
+        with fs.pigz_writer(wig) as fout:
+            fout.write(p.stdout)
     if wig.exists():
         print(wig)
     return wig
@@ -6,9 +6,9 @@ src: {basename}.fa
 dat: {basename}.fa.2.5.7.80.10.40.500.dat.gz
 out: {basename}.fa.trf.bed.gz
 """
-import gzip
 import logging
 import re
+import shutil
 from pathlib import Path
 
 import polars as pl
@@ -72,8 +72,8 @@ def trf(infile: Path):
     if is_to_run:
         pwd_dat = Path(dat.name.removesuffix(".gz"))
         _log.info(f"trf returned {p.returncode}; wrote {pwd_dat}")
-        with pwd_dat.open("rb") as fin, gzip.open(dat, "wb") as fout:
-            fout.write(fin.read())
+        with pwd_dat.open("rb") as fin, fs.pigz_writer(dat) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
         pwd_dat.unlink()
     _log.info(f"{dat}")
     return dat
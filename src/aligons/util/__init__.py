@@ -2,6 +2,7 @@ try:
     import tomllib
 except ModuleNotFoundError:
     import tomli as tomllib  # pyright: ignore[reportMissingImports]
+import contextlib
 from importlib import resources
 from pathlib import Path
 from types import MappingProxyType
@@ -11,16 +12,18 @@ ConfDict: TypeAlias = MappingProxyType[str, Any]
 
 
 def read_config(path: Path):
-    with path.open("rb") as fin:
-        update_nested(_config_src, tomllib.load(fin))
+    update_nested(_config_src, tomllib.loads(path.read_text("utf-8")))
 
 
 def update_nested(x: dict[str, Any], other: dict[str, Any]):
-    for key, value in other.items():
-        if isinstance(x_val := x.get(key), dict):
-            update_nested(x_val, value)  # type: ignore[reportUnknownArgumentType]
-        else:
-            x[key] = value
+    stack = [(x, other)]
+    while stack:
+        (dst, src) = stack.pop()
+        for key, value in src.items():
+            if isinstance(dst_val := dst.get(key), dict) and isinstance(value, dict):
+                stack.append((dst_val, value))  # type: ignore[reportUnknownArgumentType]
+            else:
+                dst[key] = value
     return x
 
 
@@ -28,13 +31,14 @@ def resources_data(child: str = ""):
     return resources.files("aligons.data").joinpath(child)
 
 
-with resources_data("config.toml").open("rb") as fin:
-    _config_src: dict[str, Any] = tomllib.load(fin)
+_config_src: dict[str, Any] = tomllib.loads(
+    resources_data("config.toml").read_text("utf-8")
+)
 
 _config_user = Path.home() / ".aligons.toml"
 _config_pwd = Path(".aligons.toml")
 for file in [_config_user, _config_pwd]:
-    if file.exists():
+    with contextlib.suppress(FileNotFoundError):
         read_config(file)
 
 
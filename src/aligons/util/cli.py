@@ -1,14 +1,18 @@
 import argparse
 import concurrent.futures as confu
 import logging
+import multiprocessing
 import os
+import threading
 from collections.abc import Callable, Iterable, Sequence
 from pathlib import Path
-from typing import Any, TypeAlias
+from typing import Any, TypeAlias, TypeVar
 
 FuturePath: TypeAlias = confu.Future[Path]
+_T = TypeVar("_T")
 
 dry_run = False
+_configured = False
 
 _log = logging.getLogger(__name__)
 
@@ -28,7 +32,8 @@ class ArgumentParser(argparse.ArgumentParser):
         group.add_argument("-v", "--verbose", action=ConfigLogging, const=1)
         group.add_argument("-q", "--quiet", action=ConfigLogging, const=-1)
         self.add_argument("-n", "--dry-run", action="store_true")
-        self.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+        jobs = min(32, os.cpu_count() or 1)  # like ThreadPoolExecutor, without +4
+        self.add_argument("-j", "--jobs", type=int, default=jobs)
 
     def parse_args(  # type: ignore[reportIncompatibleMethodOverride]
         self,
@@ -37,8 +42,11 @@ class ArgumentParser(argparse.ArgumentParser):
     ):
         res = super().parse_args(args, namespace)
         assert res is not None
-        global dry_run  # noqa: PLW0603
+        global dry_run, _configured  # noqa: PLW0603
         dry_run = res.dry_run
+        if _configured:  # basicConfig() and ThreadPool() are once per process
+            return res
+        _configured = True
         verbosity = res.verbosity
         level = _verbosity_to_level.get(verbosity, logging.NOTSET)
         logging.basicConfig(level=level, handlers=[ConsoleHandler()])
@@ -93,10 +101,90 @@ class ThreadPool:
         return cls._instance
 
 
+class ProcessPool:
+    """ProcessPoolExecutor for CPU-bound Python code that the GIL would serialize."""
+
+    _instance = None
+    max_workers = 0
+
+    def __new__(cls, max_workers: int | None = None):
+        if cls._instance is None:
+            cls.max_workers = max_workers or os.cpu_count() or 1
+            level = logging.getLogger().getEffectiveLevel()
+            # not fork: the parent has threads running
+            cls._instance = confu.ProcessPoolExecutor(
+                cls.max_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_process,
+                initargs=(dry_run, level),
+            )
+        elif max_workers is not None:
+            _log.warning(f"max_workers = {cls.max_workers}; ignored {max_workers}")
+        return cls._instance
+
+
+def _init_process(dry_run_: bool, level: int):  # noqa: FBT001
+    global dry_run  # noqa: PLW0603
+    dry_run = dry_run_
+    logging.basicConfig(level=level, handlers=[ConsoleHandler()])
+
+
+def samtools_threads(concurrent_jobs: int = 1) -> int:
+    """Threads for each htslib process when concurrent_jobs of them share CPUs.
+
+    Capped at 8 as the speedup of samtools plateaus around 4-8 threads.
+    """
+    return max(1, min(8, (os.cpu_count() or 1) // max(1, concurrent_jobs)))
+
+
 def thread_submit(fn: Callable[..., Any], /, *args: Any, **kwargs: Any):
     return ThreadPool().submit(fn, *args, **kwargs)
 
 
+def submit_after(
+    futures: Sequence[confu.Future[Any]],
+    fn: Callable[..., _T],
+    /,
+    *args: Any,
+) -> confu.Future[_T]:
+    """Submit fn(results, *args) once all futures are done.
+
+    Unlike submitting a function that calls f.result(), no thread is blocked
+    while waiting.
+    """
+    outer: confu.Future[_T] = confu.Future()
+    remaining = len(futures)
+    lock = threading.Lock()
+
+    def relay(inner: confu.Future[_T]):
+        if (exc := inner.exception()) is not None:
+            outer.set_exception(exc)
+        else:
+            outer.set_result(inner.result())
+
+    def submit():
+        try:
+            results = [f.result() for f in futures]
+        except Exception as exc:  # noqa: BLE001
+            outer.set_exception(exc)
+            return
+        thread_submit(fn, results, *args).add_done_callback(relay)
+
+    def countdown(_future: confu.Future[Any]):
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        submit()
+
+    if not futures:
+        submit()
+    for f in futures:
+        f.add_done_callback(countdown)
+    return outer
+
+
 def wait_raise(futures: Iterable[confu.Future[Any]]):
     for f in confu.as_completed(futures):
         f.result()
@@ -1,21 +1,24 @@
 import concurrent.futures as confu
 import contextlib
+import functools
 import gzip
 import io
 import itertools
 import logging
 import os
 import re
+import shutil
 import subprocess
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from pathlib import Path
-from typing import TypeVar
+from typing import IO, TypeVar
 from zipfile import ZipFile
 
 from . import cli
 
 StrPath = TypeVar("StrPath", str, Path)
 _log = logging.getLogger(__name__)
+_natural_sep = re.compile(r"[\W_]")
 
 
 def main(argv: list[str] | None = None):
@@ -52,12 +55,25 @@ def newest(files: list[Path]):
     return max(files, key=lambda p: p.stat().st_ctime)
 
 
+def iterdirs(path: Path):
+    """Yield subdirectories using d_type from readdir, not stat per entry."""
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir():
+                yield Path(entry.path)
+
+
 def sorted_naturally(iterable: Iterable[StrPath]):
     return sorted(iterable, key=natural_key)
 
 
 def natural_key(x: StrPath):
-    return [try_zeropad(s) for s in re.split(r"[\W_]", name_if_path(x))]
+    return _natural_key(name_if_path(x))
+
+
+@functools.lru_cache(maxsize=65536)
+def _natural_key(name: str) -> tuple[str, ...]:
+    return tuple(try_zeropad(s) for s in _natural_sep.split(name))
 
 
 def name_if_path(x: StrPath):
@@ -90,6 +106,37 @@ def gzip_decompress(content: bytes):
     return content
 
 
+def pigz_args(*args: str | Path) -> list[str | Path]:
+    """Build a command line for pigz, or gzip if pigz is not installed."""
+    return [_pigz_or_gzip(), *args]
+
+
+@contextlib.contextmanager
+def pigz_writer(path: Path) -> Iterator[IO[bytes]]:
+    """Open a binary writer that compresses to path with pigz -c."""
+    partial = path.with_name(path.name + ".part")
+    with partial.open("wb") as fout:
+        p = subprocess.Popen(pigz_args("-c"), stdin=subprocess.PIPE, stdout=fout)
+        assert p.stdin
+        try:
+            with p.stdin:
+                yield p.stdin
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            p.wait()
+    if p.returncode:
+        partial.unlink(missing_ok=True)
+        raise subprocess.CalledProcessError(p.returncode, p.args)
+    partial.replace(path)
+
+
+@functools.cache
+def _pigz_or_gzip():
+    return "pigz" if shutil.which("pigz") else "gzip"
+
+
 def is_gz(content: bytes):
     return content.startswith(b"\x1f\x8b")
 
@@ -22,12 +22,13 @@ STDOUT: Final = subprocess.STDOUT
 _log = logging.getLogger(__name__)
 
 
-def popen(
+def popen(  # noqa: PLR0913
     args: _CMD,
     *,
     if_: bool = True,
     stdin: _FILE = None,
     stdout: _FILE = None,
+    bufsize: int = -1,
     quiet: bool = False,
 ):  # kwargs hinders type inference of output type [str | bytes]
     (args, cmd) = prepare_args(args, if_=if_)
@@ -35,7 +36,7 @@ def popen(
         _log.debug(cmd)
     else:
         _log.info(cmd)
-    return subprocess.Popen(args, stdin=stdin, stdout=stdout)
+    return subprocess.Popen(args, bufsize=bufsize, stdin=stdin, stdout=stdout)
 
 
 def run(  # noqa: PLR0913
@@ -0,0 +1,28 @@
+import gzip
+from pathlib import Path
+
+from aligons.db import tools
+
+gff_with_blanks = b"""##gff-version 3
+##sequence-region 1 1 100
+
+1\tsrc\tgene\t50\t60\t.\t+\t.\tID=b
+
+2\tsrc\tgene\t1\t10\t.\t-\t.\tID=c
+1\tsrc\tgene\t1\t10\t.\t+\t.\tID=a
+
+
+"""
+
+
+def test_sort_gff_body_file(tmp_path: Path):
+    gz_file = tmp_path / "in.gff3.gz"
+    plain = tmp_path / "plain.gff3"
+    body = tmp_path / "body.gff3"
+    gz_file.write_bytes(gzip.compress(gff_with_blanks))
+    tools.decompress_gff(gz_file, plain)
+    assert b"\n\n" not in plain.read_bytes()
+    tools.sort_gff_body_file(plain, body)
+    expected = tools.sort_gff_body(gff_with_blanks)
+    assert body.read_bytes() == expected
+    assert expected.startswith(b"1\tsrc\tgene\t1\t")
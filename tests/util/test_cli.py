@@ -43,3 +43,17 @@ def test_threadpool(caplog: pytest.LogCaptureFixture):
     assert elapsed < seconds * acceptance
     cli.ThreadPool(42)
     assert "ignored" in caplog.text
+
+
+def test_samtools_threads():
+    assert 1 <= cli.samtools_threads() <= 8  # noqa: PLR2004
+    assert cli.samtools_threads(1 << 16) == 1
+
+
+def test_submit_after():
+    fts = [cli.thread_submit(lambda x: x, i) for i in range(3)]
+    assert cli.submit_after(fts, sum).result() == 3  # noqa: PLR2004
+    assert cli.submit_after([], len).result() == 0
+    failed = [cli.thread_submit(int, "x")]
+    with pytest.raises(ValueError, match="invalid literal"):
+        cli.submit_after(failed, len).result()
@@ -84,3 +84,21 @@ def test_chdir(tmp_path: Path):
     with fs.chdir(tmp_path):
         assert Path.cwd() == tmp_path
     assert Path.cwd() != tmp_path
+
+
+def test_iterdirs(tmp_path: Path):
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "file").touch()
+    assert list(fs.iterdirs(tmp_path)) == [tmp_path / "dir"]
+
+
+def test_pigz_writer(tmp_path: Path):
+    gz_file = tmp_path / "file.txt.gz"
+    with fs.pigz_writer(gz_file) as fout:
+        fout.write(b"hello\n")
+    assert gzip.decompress(gz_file.read_bytes()) == b"hello\n"
+    with pytest.raises(ValueError), fs.pigz_writer(gz_file) as fout:
+        fout.write(b"partial\n")
+        raise ValueError
+    assert gzip.decompress(gz_file.read_bytes()) == b"hello\n"
+    assert list(tmp_path.iterdir()) == [gz_file]
@@ -18,3 +18,6 @@ def test_update_nested():
     update_nested(x, y)
     assert x == {"both": 2, "x": 1, "y": 2}
     assert y == {"both": 2, "y": 2}
+    x = {"a": {"b": {"c": 1, "d": 1}}}
+    update_nested(x, {"a": {"b": {"c": 2}}})
+    assert x == {"a": {"b": {"c": 2, "d": 1}}}